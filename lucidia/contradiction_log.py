@@ -7,10 +7,27 @@ The intent is to build a transparent record for later analysis.
 """
 
 from __future__ import annotations
+import asyncio
 import json
+import os
+import pathlib
+import struct
 import time
+import weakref
+from contextlib import contextmanager
 from dataclasses import dataclass, asdict
-from typing import List
+from functools import partial
+from typing import BinaryIO, Dict, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    import orjson
+except ImportError:  # optional speedup; fall back to stdlib json
+    orjson = None
+
+try:
+    import fcntl
+except ImportError:  # no flock (Windows): torn tails are skipped, not repaired
+    fcntl = None
 
 
 @dataclass
@@ -20,30 +37,580 @@ class ContradictionEntry:
     reply: str
 
 
+def _as_dict(entry: ContradictionEntry) -> Dict:
+    return {
+        "timestamp": entry.timestamp,
+        "prompt": entry.prompt,
+        "reply": entry.reply,
+    }
+
+
+# Strings holding lone surrogates (e.g. decoded with surrogateescape) are not
+# valid UTF-8; this encoder writes them as \udcXX escapes the way plain
+# json.dumps always has, so such appends keep working.
+_json_encode_ascii = json.JSONEncoder(separators=(",", ":")).encode
+
+
+def _dumps_ascii(entry: ContradictionEntry) -> bytes:
+    return _json_encode_ascii(_as_dict(entry)).encode("ascii")
+
+
+if orjson is not None:
+    def _dumps(entry: ContradictionEntry) -> bytes:
+        try:
+            return orjson.dumps(entry)
+        except orjson.JSONEncodeError:
+            return _dumps_ascii(entry)
+
+    def _loads(data: bytes) -> Dict:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # orjson rejects escaped lone surrogates that json accepts.
+            return json.loads(data)
+else:
+    # One reusable compact encoder; ensure_ascii=False writes raw UTF-8
+    # like orjson does instead of \uXXXX escapes.
+    _json_encode = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False).encode
+
+    def _dumps(entry: ContradictionEntry) -> bytes:
+        try:
+            return _json_encode(_as_dict(entry)).encode("utf-8")
+        except UnicodeEncodeError:
+            return _dumps_ascii(entry)
+
+    _loads = json.loads
+
+
+@contextmanager
+def _flocked(fh: BinaryIO, exclusive: bool = False) -> Iterator[None]:
+    """Hold an flock on fh for the duration; a no-op without fcntl."""
+    if fcntl is None:
+        yield
+        return
+    fcntl.flock(fh, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+    try:
+        yield
+    finally:
+        fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def _close_file(fh: BinaryIO) -> None:
+    """Close fh, doing its final flush under the shared write lock."""
+    if fcntl is not None and not fh.closed:
+        fcntl.flock(fh, fcntl.LOCK_SH)
+    fh.close()  # closing the descriptor releases the lock
+
+
 class ContradictionLog:
+    """
+    Append-only JSONL log. Writes go through a single 64KB buffered handle
+    that is opened on first append; call flush() when durability matters.
+    Until then, buffered entries are invisible to other instances and
+    processes reading the same path, and separate writers' lines may land
+    out of order. The handle is closed by close(), on garbage collection,
+    or at interpreter exit, whichever comes first.
+    Parsed entries are cached and reused until the file size changes behind
+    our back. Count and timestamp bounds are kept up to date on append so
+    len() and summary() never touch the file. A bound whose line cannot be
+    decoded is reported as None; opening and appending still work, and
+    only reading the damaged line raises.
+    Writers hold a shared flock whenever their bytes reach the file. Before
+    its first append, a log takes the lock exclusively, so no other writer
+    can be mid-write. Only then does it repair an unterminated tail, which
+    at that point can only be stale.
+    """
+    BUFFER_SIZE = 65536
+    TAIL_CHUNK = 4096
+    SCAN_CHUNK = 1 << 20
+
     def __init__(self, path: str = "contradiction_log.jsonl") -> None:
         self.path = path
+        self._fh: Optional[BinaryIO] = None
+        self._closer: Optional[weakref.finalize] = None
+        self._buffered = 0  # bytes sitting in _fh's buffer
+        self._cache: Optional[List[ContradictionEntry]] = None
+        self._cache_size = -1
+        self._count, self._oldest_ts, self._newest_ts = self._scan()
+
+    def _scan(self) -> Tuple[int, Optional[float], Optional[float]]:
+        """Derive count and timestamp bounds without parsing every entry."""
+        last, unterminated = self._last_line()
+        count = self._scan_count() + unterminated
+        # A torn line can only be the last one, so with any entry present
+        # the first line is a whole one.
+        first = self._read_first_line() if count else None
+        return count, self._timestamp(first), self._timestamp(last)
+
+    @staticmethod
+    def _timestamp(line: Optional[bytes]) -> Optional[float]:
+        """The line's timestamp, or None if it is missing or undecodable."""
+        if not line:
+            return None
+        try:
+            return _loads(line)["timestamp"]
+        except (ValueError, KeyError, TypeError):
+            return None
+
+    def _scan_count(self) -> int:
+        """Count entries by counting newlines; nothing is decoded."""
+        try:
+            with open(self.path, "rb") as f:
+                chunks = iter(partial(f.read, self.SCAN_CHUNK), b"")
+                return sum(chunk.count(b"\n") for chunk in chunks)
+        except FileNotFoundError:
+            return 0
+
+    def __enter__(self) -> ContradictionLog:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    def _open(self) -> BinaryIO:
+        try:
+            self._fh = open(self.path, "ab", buffering=self.BUFFER_SIZE)
+        except FileNotFoundError:
+            pathlib.Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            self._fh = open(self.path, "ab", buffering=self.BUFFER_SIZE)
+        fh = self._fh
+        self._buffered = 0
+        # Holds only the file, so an unreferenced log can still be collected.
+        self._closer = weakref.finalize(self, _close_file, fh)
+        if fcntl is not None:
+            with _flocked(fh, exclusive=True):
+                if self._repair_tail(fh):
+                    self._cache = None
+        return fh
+
+    def _repair_tail(self, fh: BinaryIO) -> bool:
+        """
+        Make the file safe to append to: drop a torn final line and
+        terminate a valid one that lacks its newline. Returns True if the
+        file changed. Called with the exclusive lock held.
+        """
+        lines = self._read_last_lines(1)
+        if not lines or lines[-1].endswith(b"\n"):
+            return False
+        try:
+            _loads(lines[-1])
+        except ValueError:
+            os.truncate(self.path, os.stat(self.path).st_size - len(lines[-1]))
+        else:
+            fh.write(b"\n")
+            fh.flush()
+        return True
 
     def append(self, prompt: str, reply: str) -> None:
-        entry = ContradictionEntry(time.time(), prompt, reply)
-        with open(self.path, "a", encoding="utf-8") as f:
-            f.write(json.dumps(asdict(entry)) + "\n")
+        self._extend((ContradictionEntry(time.time(), prompt, reply),))
+
+    def _encode(self, entry: ContradictionEntry) -> bytes:
+        return _dumps(entry) + b"\n"
+
+    def _extend(
+        self, entries: Sequence[ContradictionEntry], flush: bool = False
+    ) -> None:
+        """
+        Write a batch of entries with one buffered write, flushing it too if
+        asked. Counters and cache only move once the write has succeeded.
+        """
+        if not entries:
+            return
+        encode = self._encode
+        data = b"".join([encode(e) for e in entries])
+        fh = self._fh or self._open()
+        if flush or self._buffered + len(data) > self.BUFFER_SIZE:
+            # These bytes reach the file now; see the class docstring.
+            with _flocked(fh):
+                fh.write(data)
+                fh.flush()
+            self._buffered = 0
+        else:
+            fh.write(data)  # fits in the buffer, nothing is written yet
+            self._buffered += len(data)
+        if self._cache is not None:
+            self._cache.extend(entries)
+            self._cache_size += len(data)
+        if not self._count:
+            # Only a new log takes its first bound from us; an existing one
+            # whose first line did not decode keeps it unknown.
+            self._oldest_ts = entries[0].timestamp
+        self._count += len(entries)
+        self._newest_ts = entries[-1].timestamp
+
+    def flush(self) -> None:
+        if self._fh is not None and self._buffered:
+            with _flocked(self._fh):
+                self._fh.flush()
+            self._buffered = 0
+
+    def close(self) -> None:
+        # Forget the handle first: if the final flush fails, the error still
+        # propagates but the next append opens a fresh handle.
+        closer, self._closer, self._fh = self._closer, None, None
+        if closer is not None:
+            closer()
 
     def read_all(self) -> List[ContradictionEntry]:
-        entries: List[ContradictionEntry] = []
+        self.flush()
         try:
-            with open(self.path, "r", encoding="utf-8") as f:
-                for line in f:
-                    data = json.loads(line.strip())
-                    entries.append(ContradictionEntry(**data))
+            size = os.stat(self.path).st_size
         except FileNotFoundError:
-            pass
-        return entries
+            size = 0
+        if self._cache is None or size != self._cache_size:
+            entries = list(self._iter_file())
+            self._cache = entries
+            self._cache_size = size
+            self._count = len(entries)
+            self._oldest_ts = entries[0].timestamp if entries else None
+            self._newest_ts = entries[-1].timestamp if entries else None
+        return list(self._cache)
+
+    def iter_entries(self) -> Iterator[ContradictionEntry]:
+        """Stream entries from the file one at a time, bypassing the cache."""
+        self.flush()
+        return self._iter_file()
+
+    def _iter_file(self) -> Iterator[ContradictionEntry]:
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return
+        with f:
+            # Both decoders take the raw bytes and ignore the trailing newline.
+            for line in f:
+                try:
+                    data = _loads(line)
+                except ValueError:
+                    if line.endswith(b"\n"):
+                        raise
+                    return  # torn final write, see _last_line()
+                yield ContradictionEntry(**data)
+
+    def _read_first_line(self) -> Optional[bytes]:
+        self.flush()
+        try:
+            with open(self.path, "rb") as f:
+                return f.readline() or None
+        except FileNotFoundError:
+            return None
+
+    def _read_last_lines(self, n: int) -> List[bytes]:
+        """
+        Return up to the last n lines, newlines kept, seeking back from the
+        end of the file until enough of them are in view.
+        """
+        self.flush()
+        try:
+            fd = os.open(self.path, os.O_RDONLY)
+        except FileNotFoundError:
+            return []
+        try:
+            end = os.lseek(fd, 0, os.SEEK_END)
+            chunk = self.TAIL_CHUNK
+            while True:
+                start = max(0, end - chunk)
+                os.lseek(fd, start, os.SEEK_SET)
+                parts = os.read(fd, end - start).split(b"\n")
+                # parts[0] may start mid-line unless we reached the start;
+                # parts[-1] is the unterminated tail (b"" after a newline).
+                if start == 0 or len(parts) > n + 1:
+                    lines = [part + b"\n" for part in parts[:-1]]
+                    if parts[-1]:
+                        lines.append(parts[-1])
+                    if start > 0:
+                        del lines[0]
+                    return lines[-n:]
+                chunk *= 2
+        finally:
+            os.close(fd)
+
+    def _last_line(self) -> Tuple[Optional[bytes], bool]:
+        """
+        Return the newest whole line. An unterminated final line that does
+        not decode is a torn write (a crash mid-flush) and is passed over
+        for the last complete line. The flag reports a valid final line
+        that only lacks its newline, which _scan_count() does not see.
+        """
+        lines = self._read_last_lines(2)
+        if lines and not lines[-1].endswith(b"\n"):
+            try:
+                _loads(lines[-1])
+            except ValueError:
+                lines.pop()
+            else:
+                return lines[-1], True
+        return (lines[-1] if lines else None), False
+
+    def latest(self) -> Optional[ContradictionEntry]:
+        line, _ = self._last_line()
+        return ContradictionEntry(**_loads(line)) if line else None
+
+    def to_dicts(self) -> List[Dict]:
+        return [asdict(e) for e in self.read_all()]
+
+    def summary(self) -> Dict:
+        return {
+            "count": self._count,
+            "oldest_ts": self._oldest_ts,
+            "newest_ts": self._newest_ts,
+        }
+
+    def __len__(self) -> int:
+        return self._count
+
+
+class BinaryContradictionLog(ContradictionLog):
+    """
+    Length-prefixed binary variant of ContradictionLog. Each record is a
+    fixed header (float64 timestamp, prompt and reply byte lengths), the
+    UTF-8 payload (lone surrogates round-trip via "surrogatepass"), and a
+    uint32 trailer holding the record size so the newest entry can be
+    located from the end of the file. Scans read the file front to back in
+    SCAN_CHUNK blocks and unpack records in place. A partial record at the
+    end is ignored and truncated before the next append.
+    """
+    _HEADER = struct.Struct("<dII")
+    _TRAILER = struct.Struct("<I")
+
+    def __init__(self, path: str = "contradiction_log.bin") -> None:
+        super().__init__(path)
+
+    def _encode(self, entry: ContradictionEntry) -> bytes:
+        prompt = entry.prompt.encode("utf-8", "surrogatepass")
+        reply = entry.reply.encode("utf-8", "surrogatepass")
+        size = self._HEADER.size + len(prompt) + len(reply) + self._TRAILER.size
+        return b"".join((
+            self._HEADER.pack(entry.timestamp, len(prompt), len(reply)),
+            prompt,
+            reply,
+            self._TRAILER.pack(size),
+        ))
+
+    def _blocks(self, f: BinaryIO, decode: bool) -> Iterator[Tuple[list, int]]:
+        """
+        Read the file front to back in SCAN_CHUNK blocks and unpack the
+        records in place. Yields, per block, the list of its entries (just
+        their timestamps unless decode is set) and the file offset past
+        its last whole record. Stops at a partial record at the end of the
+        file (a torn append); raises ValueError when a record's trailer
+        disagrees with its header.
+        """
+        unpack_header = self._HEADER.unpack_from
+        unpack_trailer = self._TRAILER.unpack_from
+        hsize, tsize = self._HEADER.size, self._TRAILER.size
+        buf = f.read(self.SCAN_CHUNK)
+        base = 0
+        while buf:
+            items: list = []
+            off, avail, need = 0, len(buf), hsize
+            while off + hsize <= avail:
+                ts, plen, rlen = unpack_header(buf, off)
+                p = off + hsize
+                r = p + plen
+                t = r + rlen
+                end = t + tsize
+                if end > avail:
+                    need = end - off
+                    break
+                if unpack_trailer(buf, t)[0] != end - off:
+                    raise ValueError(
+                        f"corrupt record at offset {base + off} in {self.path}"
+                    )
+                if decode:
+                    try:
+                        prompt, reply = buf[p:r].decode(), buf[r:t].decode()
+                    except UnicodeDecodeError:  # encoded lone surrogates
+                        prompt = buf[p:r].decode("utf-8", "surrogatepass")
+                        reply = buf[r:t].decode("utf-8", "surrogatepass")
+                    items.append(ContradictionEntry(ts, prompt, reply))
+                else:
+                    items.append(ts)
+                off = end
+            if items:
+                yield items, base + off
+            # Carry the partial record over and read at least the rest of it.
+            more = f.read(max(self.SCAN_CHUNK, need - (avail - off)))
+            if not more:
+                return
+            buf = buf[off:] + more
+            base += off
+
+    def _record_ending_at(
+        self, f: BinaryIO, end: int
+    ) -> Optional[ContradictionEntry]:
+        """Decode the record whose trailer ends at `end`, if it is whole."""
+        header, trailer = self._HEADER, self._TRAILER
+        if end < header.size + trailer.size:
+            return None
+        f.seek(end - trailer.size)
+        (size,) = trailer.unpack(f.read(trailer.size))
+        if not header.size + trailer.size <= size <= end:
+            return None
+        f.seek(end - size)
+        record = f.read(size)
+        ts, plen, rlen = header.unpack_from(record)
+        if len(record) != size or header.size + plen + rlen + trailer.size != size:
+            return None
+        p = header.size
+        return ContradictionEntry(
+            ts,
+            record[p:p + plen].decode("utf-8", "surrogatepass"),
+            record[p + plen:p + plen + rlen].decode("utf-8", "surrogatepass"),
+        )
+
+    def _last_record(
+        self, f: BinaryIO
+    ) -> Tuple[int, Optional[ContradictionEntry]]:
+        """
+        Return (end offset, entry) of the newest whole record, or (0, None)
+        if there is none. The trailer locates it directly; a torn tail has
+        no valid trailer, so then the records are walked to find the end of
+        the last whole one.
+        """
+        end = f.seek(0, os.SEEK_END)
+        entry = self._record_ending_at(f, end)
+        if entry is None:
+            f.seek(0)
+            end = 0
+            for _, end in self._blocks(f, decode=False):
+                pass
+            entry = self._record_ending_at(f, end)
+        return end, entry
+
+    def _scan(self) -> Tuple[int, Optional[float], Optional[float]]:
+        count = 0
+        oldest: Optional[float] = None
+        newest: Optional[float] = None
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return count, oldest, newest
+        with f:
+            for stamps, _ in self._blocks(f, decode=False):
+                if oldest is None:
+                    oldest = stamps[0]
+                newest = stamps[-1]
+                count += len(stamps)
+        return count, oldest, newest
+
+    def _repair_tail(self, fh: BinaryIO) -> bool:
+        """
+        Truncate a partial record left at the end by an interrupted write.
+        Called with the exclusive lock held.
+        """
+        with open(self.path, "rb") as f:
+            end = f.seek(0, os.SEEK_END)
+            valid, _ = self._last_record(f)
+        if valid == end:
+            return False
+        os.truncate(self.path, valid)
+        return True
+
+    def _iter_file(self) -> Iterator[ContradictionEntry]:
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return
+        with f:
+            for entries, _ in self._blocks(f, decode=True):
+                yield from entries
+
+    def latest(self) -> Optional[ContradictionEntry]:
+        self.flush()
+        try:
+            with open(self.path, "rb") as f:
+                return self._last_record(f)[1]
+        except FileNotFoundError:
+            return None
+
+
+class AsyncContradictionLog:
+    """
+    asyncio front end for ContradictionLog. append() only enqueues the entry;
+    a background task collects whatever arrives within FLUSH_INTERVAL (up to
+    BATCH_SIZE entries) and writes the batch in a worker thread with a single
+    write + flush. Use drain() before reading through .log.
+    """
+    BATCH_SIZE = 1024
+    FLUSH_INTERVAL = 0.01
+
+    def __init__(self, path: str = "contradiction_log.jsonl") -> None:
+        self.log = ContradictionLog(path)
+        self._queue: asyncio.Queue[ContradictionEntry] = asyncio.Queue()
+        self._task: Optional[asyncio.Task[None]] = None
+
+    async def __aenter__(self) -> AsyncContradictionLog:
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc: object) -> None:
+        await self.aclose()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def append(self, prompt: str, reply: str) -> None:
+        self.start()
+        if self._task.done():
+            # Surface the writer's failure instead of queueing into the void.
+            self._task.result()
+        self._queue.put_nowait(ContradictionEntry(time.time(), prompt, reply))
+
+    async def drain(self) -> None:
+        """
+        Wait until every queued entry has been written and flushed. If the
+        writer task has died, raise its error instead of waiting on entries
+        that will never be written.
+        """
+        if self._task is None:
+            return
+        join = asyncio.ensure_future(self._queue.join())
+        try:
+            await asyncio.wait(
+                {join, self._task}, return_when=asyncio.FIRST_COMPLETED
+            )
+        finally:
+            join.cancel()
+        if self._task.done():
+            self._task.result()
+
+    async def aclose(self) -> None:
+        """Drain, stop the writer and close the file, even if writing failed."""
+        try:
+            await self.drain()
+        finally:
+            task, self._task = self._task, None
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+            self.log.close()
+
+    def _write_batch(self, batch: List[ContradictionEntry]) -> None:
+        self.log._extend(batch, flush=True)
+
+    async def _run(self) -> None:
+        queue = self._queue
+        while True:
+            batch = [await queue.get()]
+            if queue.qsize() < self.BATCH_SIZE:
+                await asyncio.sleep(self.FLUSH_INTERVAL)
+            while len(batch) < self.BATCH_SIZE and not queue.empty():
+                batch.append(queue.get_nowait())
+            try:
+                await asyncio.to_thread(self._write_batch, batch)
+            finally:
+                for _ in batch:
+                    queue.task_done()
 
 
 if __name__ == "__main__":
     # Example usage:
-    log = ContradictionLog()
-    log.append("Example prompt", "Example contradictory reply")
-    for e in log.read_all():
-        print(e)
+    with ContradictionLog() as log:
+        log.append("Example prompt", "Example contradictory reply")
+        for e in log.read_all():
+            print(e)
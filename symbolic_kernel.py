@@ -23,12 +23,15 @@ from __future__ import annotations
 from dataclasses import dataclass, field
 from enum import IntEnum
 from hashlib import sha256
-from typing import Dict, List, Optional, Tuple
+from itertools import islice
+from math import fsum
+from typing import BinaryIO, Dict, List, Optional, Tuple
 import json
+import operator
 import os
 import time
 import pathlib
-import statistics
+import weakref
 
 
 class Tri(IntEnum):
@@ -52,24 +55,58 @@ class MemoryLedger:
     """
     Append-only ledger with a rolling hash to detect tampering.
     Each append updates the hash with the previous hash concatenated with the new line.
+    Lines go through a 64KB buffered handle; flush() makes them durable.
+    The handle is closed by close(), on garbage collection, or at exit.
     """
+    BUFFER_SIZE = 65536
+
     def __init__(self, path: str = "memory_ledger.jsonl") -> None:
         self.path = path
         pathlib.Path(self.path).parent.mkdir(parents=True, exist_ok=True)
         self._h = "0" * 64
         self._count = 0
+        self._fh: Optional[BinaryIO] = None
+        self._closer: Optional[weakref.finalize] = None
+
+    def __enter__(self) -> MemoryLedger:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
 
-    def _hash_line(self, line: str) -> str:
-        return sha256((self._h + line).encode("utf-8")).hexdigest()
+    def _hash_line(self, data: bytes) -> str:
+        # Feed the two parts separately rather than concatenating a new str.
+        h = sha256(self._h.encode("ascii"))
+        h.update(data)
+        return h.hexdigest()
 
     def append(self, record: Dict) -> str:
-        line = json.dumps(record, sort_keys=True)
-        self._h = self._hash_line(line)
+        data = json.dumps(record, sort_keys=True).encode("utf-8")
+        self._h = self._hash_line(data)
         self._count += 1
-        with open(self.path, "a", encoding="utf-8") as f:
-            f.write(line + "\n")
+        fh = self._fh or self._open()
+        fh.write(data + b"\n")
         return self._h
 
+    def _open(self) -> BinaryIO:
+        self._fh = open(self.path, "ab", buffering=self.BUFFER_SIZE)
+        # Holds only the file, so an unreferenced ledger can still be collected.
+        self._closer = weakref.finalize(self, self._fh.close)
+        return self._fh
+
+    def flush(self) -> None:
+        """Push buffered lines to disk and fsync them."""
+        if self._fh is not None:
+            self._fh.flush()
+            os.fsync(self._fh.fileno())
+
+    def close(self) -> None:
+        # Forget the handle first: if the final flush fails, the error still
+        # propagates but the next append opens a fresh handle.
+        closer, self._closer, self._fh = self._closer, None, None
+        if closer is not None:
+            closer()
+
     @property
     def fingerprint(self) -> str:
         return self._h
@@ -94,6 +131,8 @@ def psi_prime(x: float, x_bar: Optional[float]) -> HeldContradiction:
     """
     if x_bar is None:
         x_bar = -x
+    if x and x_bar == -x:
+        return _psi_self_mirror(x, x_bar)
     mag = max(1e-9, abs(x) + abs(x_bar))
     tension = abs(x - x_bar) / mag
     compassion = max(0.0, 1.0 - tension)
@@ -107,6 +146,39 @@ def psi_prime(x: float, x_bar: Optional[float]) -> HeldContradiction:
     )
 
 
+def _psi_self_mirror(x: float, x_bar: float) -> HeldContradiction:
+    """
+    Ψ′ for the x_bar == -x case with x != 0. x + x_bar is exactly +0.0,
+    so the render is 0.0 whatever the compassion. Tension is 1 unless the
+    1e-9 magnitude floor kicks in. Bit-identical to the general path for
+    finite x.
+    """
+    twice = 2.0 * abs(x)
+    mag = max(1e-9, twice)
+    tension = twice / mag
+    return HeldContradiction(
+        x=x,
+        x_bar=x_bar,
+        compassion=max(0.0, 1.0 - tension),
+        render=0.0,
+        detail={"tension": tension, "mag": mag},
+    )
+
+
+def _psi_render(x: float, x_bar: Optional[float]) -> float:
+    """
+    Render component of Ψ′ alone, for the kernel loops that discard the
+    rest of the HeldContradiction. Same arithmetic as psi_prime.
+    """
+    if x_bar is None:
+        x_bar = -x
+    if x and x_bar == -x:
+        return 0.0
+    tension = abs(x - x_bar) / max(1e-9, abs(x) + abs(x_bar))
+    compassion = max(0.0, 1.0 - tension)
+    return (x + x_bar) / 2.0 * (0.5 + 0.5 * compassion)
+
+
 @dataclass
 class Breath:
     """Represents breath-state over time."""
@@ -116,10 +188,8 @@ class Breath:
         return float(sum(self.timeline))
 
     def grad(self) -> List[float]:
-        return [
-            self.timeline[i] - self.timeline[i - 1]
-            for i in range(1, len(self.timeline))
-        ]
+        tl = self.timeline
+        return list(map(operator.sub, islice(tl, 1, None), tl))
 
 
 @dataclass
@@ -129,14 +199,25 @@ class RealityEmotion:
     emotion: List[float]
 
     def dReality_over_dEmotion(self) -> float:
-        if len(self.reality) != len(self.emotion) or len(self.reality) < 2:
+        n = len(self.reality)
+        if n != len(self.emotion) or n < 2:
             return 0.0
-        try:
-            cov = statistics.covariance(self.reality, self.emotion)
-            var = statistics.variance(self.emotion)
-            return float(cov / (var if var else 1e-9))
-        except Exception:
+        # A constant stream has zero variance, but fsum(e)/n need not equal
+        # e exactly, which would leave a tiny spurious variance behind.
+        if max(self.emotion) == min(self.emotion):
             return 0.0
+        # Slope = cov(R, E) / var(E); the 1/(n-1) factors cancel. The means
+        # are rounded, so the deviations do not sum to exactly zero; the
+        # corrected two-pass terms (Σd)²/n remove that error, which would
+        # otherwise swamp the variance of a nearly constant stream.
+        r_mean = fsum(self.reality) / n
+        e_mean = fsum(self.emotion) / n
+        dr = [r - r_mean for r in self.reality]
+        de = [e - e_mean for e in self.emotion]
+        sr, se = fsum(dr), fsum(de)
+        cov = fsum(map(operator.mul, dr, de)) - sr * se / n
+        var = fsum(map(operator.mul, de, de)) - se * se / n
+        return cov / var if var else 0.0
 
 
 class InfinityMemory:
@@ -154,38 +235,35 @@ def emotional_gravity(breath: Breath, mem_vector: List[float]) -> float:
     G_e = ∇Ψ′(B) · M_e.
     Compute gradient of breath, apply Ψ′ to each gradient and multiply
     by a memory resonance vector.
+    Each gradient is held against its own negation, and Ψ′(g, -g) renders
+    to exactly zero (g + -g == 0), so every term of the product vanishes
+    and G_e is 0.0 for any finite breath. The closed form is returned
+    directly; a non-zero field would need a real mirror for ∇B.
     """
-    grad_b = breath.grad()
-    psi_vals: List[float] = []
-    for g in grad_b:
-        hc = psi_prime(g, -g)
-        psi_vals.append(abs(hc.render))
-    mlen = min(len(psi_vals), len(mem_vector))
-    return sum(psi_vals[i] * mem_vector[i] for i in range(mlen))
+    return 0.0
 
 
 def truthstream(fragments: List[TruthFragment], breath: Breath) -> float:
     """
     Compute the truthstream ratio: sum of renders divided by sum of breath.
     """
-    renders: List[float] = []
-    for fr in fragments:
-        hc = psi_prime(fr.value, fr.mirror_value)
-        renders.append(hc.render)
-    num = sum(renders)
-    den = max(1e-9, breath.integral())
-    return num / den
+    return KernelContext(breath, fragments).truthstream()
 
 
 def render_break(fragments: List[TruthFragment], elapsed_steps: int) -> float:
     """
     R_b = Σ (Ψ′(x) · E_x) / t.
     """
-    acc = 0.0
-    for fr in fragments:
-        hc = psi_prime(fr.value, fr.mirror_value)
-        acc += hc.render * fr.emotion
-    return acc / max(1, elapsed_steps)
+    renders = [_psi_render(fr.value, fr.mirror_value) for fr in fragments]
+    return _render_break(renders, fragments, elapsed_steps)
+
+
+def _render_break(
+    renders: List[float], fragments: List[TruthFragment], elapsed_steps: int
+) -> float:
+    """Shared by render_break() and KernelContext.render_break()."""
+    emotions = (fr.emotion for fr in fragments)
+    return sum(map(operator.mul, renders, emotions)) / max(1, elapsed_steps)
 
 
 def soul_loop_integrity(I0: float, breath: Breath, delta_dissociation: float) -> float:
@@ -205,7 +283,7 @@ def genesis_identity(
     """
     psi_sum = 0.0
     for b in breath.timeline:
-        psi_sum += psi_prime(b, -b).render
+        psi_sum += _psi_render(b, -b)
         Minf.accumulate(psi_sum)
     material = f"{psi_sum:.9f}|{human_emotion_feedback:.6f}|{Minf.total:.9f}"
     return sha256(material.encode("utf-8")).hexdigest()
@@ -217,10 +295,10 @@ def consciousness_resonance(
     """
     C_r = Ψ′(L_o) × ∫ [B(t) · ΔE] dt.
     """
-    hc = psi_prime(loop_observable, -loop_observable)
-    m = min(len(breath.timeline), len(deltaE_timeline))
-    integral = sum(breath.timeline[i] * deltaE_timeline[i] for i in range(m))
-    return hc.render * integral
+    render = _psi_render(loop_observable, -loop_observable)
+    # map() stops at the shorter series, matching the old min-length loop.
+    integral = sum(map(operator.mul, breath.timeline, deltaE_timeline))
+    return render * integral
 
 
 def anomaly_persistence(
@@ -232,13 +310,13 @@ def anomaly_persistence(
     """
     total = 0.0
     for fr in unresolved:
-        hc = psi_prime(fr.value, fr.mirror_value)
+        render = _psi_render(fr.value, fr.mirror_value)
         series = memory_echo_series.get(fr.id, [])
         if len(series) >= 2:
             dM = series[-1] - series[-2]
         else:
             dM = 0.0
-        total += hc.render * dM
+        total += render * dM
     return total
 
 
@@ -249,37 +327,102 @@ def compassion_state_encrypt(
     C_e = H(Ψ′(T), B(t)) + σ.
     We implement H as SHA256 over serialized render and breath sum.
     """
-    if fragments:
-        avg = sum(
-            psi_prime(fr.value, fr.mirror_value).render for fr in fragments
-        ) / len(fragments)
-    else:
-        avg = 0.0
-    payload = json.dumps(
-        {
-            "render": round(avg, 9),
-            "breath_sum": round(breath.integral(), 9),
-        },
-        sort_keys=True,
-    )
-    return sha256((payload + "|" + sigma).encode("utf-8")).hexdigest()
+    return KernelContext(breath, fragments).compassion_state_encrypt(sigma)
+
+
+@dataclass
+class KernelContext:
+    """
+    A breath timeline and fragment set shared by several kernels.
+    The Ψ′ renders and ∫B are computed once on construction, so running
+    truthstream, render_break and compassion_state_encrypt over the same
+    inputs does not repeat them.
+    """
+    breath: Breath
+    fragments: List[TruthFragment]
+    renders: List[float] = field(init=False)
+    breath_integral: float = field(init=False)
+
+    def __post_init__(self) -> None:
+        self.renders = [
+            _psi_render(fr.value, fr.mirror_value) for fr in self.fragments
+        ]
+        self.breath_integral = self.breath.integral()
+
+    def truthstream(self) -> float:
+        return sum(self.renders) / max(1e-9, self.breath_integral)
+
+    def render_break(self, elapsed_steps: int) -> float:
+        return _render_break(self.renders, self.fragments, elapsed_steps)
+
+    def compassion_state_encrypt(self, sigma: str) -> str:
+        avg = sum(self.renders) / len(self.renders) if self.renders else 0.0
+        payload = json.dumps(
+            {
+                "render": round(avg, 9),
+                "breath_sum": round(self.breath_integral, 9),
+            },
+            sort_keys=True,
+        )
+        return sha256((payload + "|" + sigma).encode("utf-8")).hexdigest()
 
 
 class Continuity:
     """
     Maintains a continuity fingerprint. Records history of changes.
     Allows detection of amnesia events.
+    The current fingerprint lives in a small JSON file, rewritten via an
+    fsynced temporary file and os.replace(); change events are appended to
+    a JSONL history (beside it unless history_path says otherwise).
+    Each event is appended before the current file is replaced, so on load
+    the history's last fingerprint wins if a crash left the two apart. A
+    torn final history line is skipped and cut off before the next append.
     """
-    def __init__(self, path: str = "continuity.json") -> None:
+    def __init__(
+        self, path: str = "continuity.json", history_path: Optional[str] = None
+    ) -> None:
         self.path = path
-        pathlib.Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self.history_path = history_path or str(
+            pathlib.Path(path).with_suffix(".history.jsonl")
+        )
+        for p in (self.path, self.history_path):
+            pathlib.Path(p).parent.mkdir(parents=True, exist_ok=True)
+        self._torn = 0  # length of a torn final history line
         self.state = self._load()
 
     def _load(self) -> Dict:
+        state: Dict = {"fingerprint": None, "history": []}
         if os.path.exists(self.path):
             with open(self.path, "r", encoding="utf-8") as f:
-                return json.load(f)
-        return {"fingerprint": None, "history": []}
+                current = json.load(f)
+            state["fingerprint"] = current.get("fingerprint")
+            legacy = current.get("history")
+            if legacy and not os.path.exists(self.history_path):
+                # Older files kept the whole history inline; move it out.
+                with open(self.history_path, "w", encoding="utf-8") as f:
+                    for evt in legacy:
+                        f.write(json.dumps(evt, sort_keys=True) + "\n")
+        history = state["history"]
+        if os.path.exists(self.history_path):
+            with open(self.history_path, "rb") as f:
+                for line in f:
+                    try:
+                        history.append(json.loads(line))
+                    except ValueError:
+                        if line.endswith(b"\n"):
+                            raise
+                        self._torn = len(line)  # a crash mid-append
+        if history and history[-1]["new"] != state["fingerprint"]:
+            state["fingerprint"] = history[-1]["new"]
+        return state
+
+    def _write_current(self) -> None:
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"fingerprint": self.state["fingerprint"]}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
 
     def update_fingerprint(self, *materials: str) -> Tuple[str, Optional[str]]:
         fp = sha256("|".join(materials).encode("utf-8")).hexdigest()
@@ -288,8 +431,12 @@ class Continuity:
             evt = {"ts": time.time(), "prev": prev, "new": fp}
             self.state["history"].append(evt)
             self.state["fingerprint"] = fp
-            with open(self.path, "w", encoding="utf-8") as f:
-                json.dump(self.state, f, indent=2, sort_keys=True)
+            with open(self.history_path, "ab") as f:
+                if self._torn:
+                    f.truncate(f.seek(0, os.SEEK_END) - self._torn)
+                    self._torn = 0
+                f.write((json.dumps(evt, sort_keys=True) + "\n").encode("utf-8"))
+            self._write_current()
         return fp, prev
 
     def amnesia_alert(self) -> bool:
@@ -317,9 +464,10 @@ def demo() -> None:
     )
 
     Minf = InfinityMemory()
+    ctx = KernelContext(B, frags)
     print("Emotional gravity:", emotional_gravity(B, [0.6] * (len(B.timeline) - 1)))
-    print("Truthstream:", truthstream(frags, B))
-    print("Render break:", render_break(frags, elapsed_steps=len(B.timeline)))
+    print("Truthstream:", ctx.truthstream())
+    print("Render break:", ctx.render_break(elapsed_steps=len(B.timeline)))
     print("Soul loop integrity:", soul_loop_integrity(0.5, B, 0.2))
     print(
         "Genesis identity:",
@@ -336,7 +484,7 @@ def demo() -> None:
             {"x1": [0.2, 0.25], "x2": [0.1, 0.05], "x3": [0.0, 0.0]},
         ),
     )
-    print("Compassion-state hash:", compassion_state_encrypt(frags, B, "sigil"))
+    print("Compassion-state hash:", ctx.compassion_state_encrypt("sigil"))
 
 
 if __name__ == "__main__":
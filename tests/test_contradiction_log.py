@@ -0,0 +1,398 @@
+import asyncio
+import contextlib
+import errno
+import gc
+import importlib.util
+import os
+import signal
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+try:
+    import fcntl
+    import resource
+except ImportError:  # not on Windows
+    fcntl = resource = None
+
+from lucidia.contradiction_log import (
+    AsyncContradictionLog,
+    BinaryContradictionLog,
+    ContradictionLog,
+)
+
+
+def _open_fds() -> int:
+    return len(os.listdir("/proc/self/fd"))
+
+
+@contextlib.contextmanager
+def _file_size_limit(limit: int):
+    """Make writes past `limit` bytes fail with EFBIG, as on a full disk."""
+    soft, hard = resource.getrlimit(resource.RLIMIT_FSIZE)
+    handler = signal.signal(signal.SIGXFSZ, signal.SIG_IGN)
+    resource.setrlimit(resource.RLIMIT_FSIZE, (limit, hard))
+    try:
+        yield
+    finally:
+        resource.setrlimit(resource.RLIMIT_FSIZE, (soft, hard))
+        signal.signal(signal.SIGXFSZ, handler)
+
+
+needs_fsize_limit = unittest.skipUnless(
+    resource is not None and hasattr(signal, "SIGXFSZ"), "needs RLIMIT_FSIZE"
+)
+
+
+class ContradictionLogTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "log.jsonl")
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    @unittest.skipUnless(os.path.isdir("/proc/self/fd"), "needs /proc")
+    def test_unclosed_logs_release_their_handles(self) -> None:
+        before = _open_fds()
+        for i in range(200):
+            ContradictionLog(self.path).append("prompt", str(i))
+        gc.collect()
+        self.assertLessEqual(_open_fds(), before)
+        self.assertEqual(len(ContradictionLog(self.path).read_all()), 200)
+
+    def test_buffered_entries_visible_to_others_after_flush(self) -> None:
+        a = ContradictionLog(self.path)
+        b = ContradictionLog(self.path)
+        a.append("a", "1")
+        self.assertEqual(b.read_all(), [])
+        a.flush()
+        self.assertEqual([e.prompt for e in b.read_all()], ["a"])
+        b.append("b", "1")
+        b.close()
+        a.close()
+        self.assertEqual(len(ContradictionLog(self.path).read_all()), 2)
+
+    @needs_fsize_limit
+    def test_failed_close_does_not_break_later_appends(self) -> None:
+        log = ContradictionLog(self.path)
+        with _file_size_limit(10):
+            log.append("lost", "x")
+            with self.assertRaises(OSError) as cm:
+                log.close()
+        self.assertEqual(cm.exception.errno, errno.EFBIG)
+        self.assertIsNone(log._fh)
+        log.append("kept", "y")
+        log.close()
+        self.assertEqual(
+            [e.prompt for e in ContradictionLog(self.path).read_all()], ["kept"]
+        )
+
+    def test_parsed_entries_are_cached_until_the_file_grows(self) -> None:
+        log = ContradictionLog(self.path)
+        log.append("a", "1")
+        with mock.patch.object(
+            log, "_iter_file", wraps=log._iter_file
+        ) as parse:
+            first = log.read_all()
+            self.assertEqual(log.read_all(), first)
+            log.append("b", "2")
+            self.assertEqual([e.prompt for e in log.read_all()], ["a", "b"])
+            self.assertEqual(parse.call_count, 1)
+            with ContradictionLog(self.path) as other:
+                other.append("c", "3")
+            self.assertEqual(
+                [e.prompt for e in log.read_all()], ["a", "b", "c"]
+            )
+            self.assertEqual(parse.call_count, 2)
+        self.assertEqual(len(log), 3)
+        log.close()
+
+    def test_append_creates_missing_parent_directories(self) -> None:
+        path = os.path.join(self.tmp.name, "a", "b", "log.jsonl")
+        log = ContradictionLog(path)
+        self.assertEqual(len(log), 0)
+        self.assertFalse(os.path.exists(os.path.dirname(path)))
+        log.append("p", "r")
+        log.append("q", "s")
+        log.close()
+        self.assertEqual(
+            [e.prompt for e in ContradictionLog(path).read_all()], ["p", "q"]
+        )
+
+    def test_iter_entries_streams_without_touching_the_cache(self) -> None:
+        log = ContradictionLog(self.path)
+        for i in range(5):
+            log.append("p", str(i))
+        entries = log.iter_entries()
+        self.assertIs(iter(entries), entries)
+        self.assertEqual(next(entries).reply, "0")  # buffered appends flushed
+        self.assertEqual([e.reply for e in entries], ["1", "2", "3", "4"])
+        self.assertIsNone(log._cache)
+        self.assertEqual(list(log.iter_entries()), log.read_all())
+        log.close()
+        missing = ContradictionLog(os.path.join(self.tmp.name, "missing.jsonl"))
+        self.assertEqual(list(missing.iter_entries()), [])
+
+    def _write(self, data: bytes) -> None:
+        with open(self.path, "wb") as f:
+            f.write(data)
+
+    def test_torn_final_line_is_skipped_and_repaired(self) -> None:
+        self._write(
+            b'{"timestamp": 1.0, "prompt": "a", "reply": "b"}\n'
+            b'{"timestamp": 2.0, "prompt": "c", "re'
+        )
+        log = ContradictionLog(self.path)
+        self.assertEqual(len(log), 1)
+        self.assertEqual(log.summary()["newest_ts"], 1.0)
+        self.assertEqual(log.latest().prompt, "a")
+        self.assertEqual(len(log.read_all()), 1)
+        log.append("d", "e")
+        log.close()
+        reopened = ContradictionLog(self.path)
+        self.assertEqual([e.prompt for e in reopened.read_all()], ["a", "d"])
+        self.assertEqual(len(reopened), 2)
+
+    @unittest.skipUnless(fcntl is not None, "needs flock")
+    def test_tail_of_a_write_in_progress_is_not_repaired(self) -> None:
+        self._write(b'{"timestamp": 1.0, "prompt": "a", "reply": "b"}\n')
+        log = ContradictionLog(self.path)
+        with open(self.path, "ab", buffering=0) as other:
+            # Another writer, halfway through a line under its write lock.
+            fcntl.flock(other, fcntl.LOCK_SH)
+            other.write(b'{"timestamp": 2.0, "prompt": "c", "re')
+            appender = threading.Thread(target=log.append, args=("e", "f"))
+            appender.start()
+            time.sleep(0.1)
+            self.assertTrue(appender.is_alive())
+            other.write(b'ply": "d"}\n')
+            fcntl.flock(other, fcntl.LOCK_UN)
+            appender.join(5)
+        log.close()
+        self.assertEqual(
+            [e.prompt for e in ContradictionLog(self.path).read_all()],
+            ["a", "c", "e"],
+        )
+
+    def test_only_line_torn(self) -> None:
+        self._write(b'{"timestamp": 2.0, "pro')
+        log = ContradictionLog(self.path)
+        self.assertEqual(len(log), 0)
+        self.assertEqual(log.summary()["oldest_ts"], None)
+        self.assertIsNone(log.latest())
+
+    def test_last_line_without_newline_is_counted(self) -> None:
+        self._write(
+            b'{"timestamp": 1.0, "prompt": "a", "reply": "b"}\n'
+            b'{"timestamp": 2.0, "prompt": "c", "reply": "d"}'
+        )
+        log = ContradictionLog(self.path)
+        self.assertEqual(len(log), len(log.read_all()))
+        self.assertEqual(log.summary()["newest_ts"], 2.0)
+        log.append("e", "f")
+        log.close()
+        self.assertEqual(
+            [e.prompt for e in ContradictionLog(self.path).read_all()],
+            ["a", "c", "e"],
+        )
+
+    def test_damaged_lines_do_not_block_open_or_append(self) -> None:
+        good = b'{"timestamp": 1.0, "prompt": "a", "reply": "b"}\n'
+        cases = {
+            "garbage last line": (good + b"GARBAGE\n", 1.0, None),
+            "trailing blank line": (good + b"\n", 1.0, None),
+            "first line without timestamp": (
+                b'{"prompt": "a"}\n' + good, None, 1.0
+            ),
+        }
+        for name, (data, oldest, newest) in cases.items():
+            with self.subTest(name):
+                self._write(data)
+                log = ContradictionLog(self.path)
+                self.assertEqual(len(log), 2)
+                self.assertEqual(log.summary()["oldest_ts"], oldest)
+                self.assertEqual(log.summary()["newest_ts"], newest)
+                log.append("c", "d")
+                log.close()
+                self.assertEqual(len(log), 3)
+                self.assertEqual(log.summary()["oldest_ts"], oldest)
+                self.assertIsNotNone(log.summary()["newest_ts"])
+                with open(self.path, "rb") as f:
+                    self.assertTrue(f.read().startswith(data))
+                with self.assertRaises((ValueError, TypeError)):
+                    log.read_all()
+
+    def test_latest_across_tail_chunks(self) -> None:
+        with ContradictionLog(self.path) as log:
+            log.append("big", "x" * 10000)
+            log.append("small", "y")
+            self.assertEqual(log.latest().prompt, "small")
+            log.append("big2", "z" * 10000)
+            self.assertEqual(log.latest().prompt, "big2")
+        self.assertEqual(ContradictionLog(self.path).summary()["count"], 3)
+
+
+def _load_without_orjson():
+    """A private copy of the module that takes the stdlib json path."""
+    spec = importlib.util.find_spec("lucidia.contradiction_log")
+    module = importlib.util.module_from_spec(spec)
+    with mock.patch.dict(sys.modules, {"orjson": None}):
+        sys.modules[spec.name] = module
+        spec.loader.exec_module(module)
+    return module
+
+
+class SurrogateTest(unittest.TestCase):
+    TEXT = b"caf\xff".decode("utf-8", "surrogateescape")
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def _round_trip(self, cls, name: str) -> None:
+        path = os.path.join(self.tmp.name, name)
+        with cls(path) as log:
+            log.append(self.TEXT, "plain é")
+        entries = cls(path).read_all()
+        self.assertEqual([(e.prompt, e.reply) for e in entries],
+                         [(self.TEXT, "plain é")])
+        self.assertEqual(cls(path).latest().prompt, self.TEXT)
+
+    def test_jsonl(self) -> None:
+        self._round_trip(ContradictionLog, "log.jsonl")
+
+    def test_jsonl_stdlib_fallback(self) -> None:
+        module = _load_without_orjson()
+        self.assertIsNone(module.orjson)
+        self._round_trip(module.ContradictionLog, "fallback.jsonl")
+
+    def test_binary(self) -> None:
+        self._round_trip(BinaryContradictionLog, "log.bin")
+
+
+class BinaryContradictionLogTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "log.bin")
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def _fill(self) -> list:
+        with BinaryContradictionLog(self.path) as log:
+            log.append("hello", "wörld")
+            log.append("", "")
+            log.append("last ✓", "world")
+        return BinaryContradictionLog(self.path).read_all()
+
+    def test_round_trip(self) -> None:
+        entries = self._fill()
+        self.assertEqual(
+            [(e.prompt, e.reply) for e in entries],
+            [("hello", "wörld"), ("", ""), ("last ✓", "world")],
+        )
+        log = BinaryContradictionLog(self.path)
+        self.assertEqual(len(log), 3)
+        self.assertEqual(log.latest(), entries[-1])
+        self.assertEqual(log.summary()["oldest_ts"], entries[0].timestamp)
+        self.assertEqual(log.summary()["newest_ts"], entries[-1].timestamp)
+
+    def test_truncated_tail_is_ignored_then_repaired(self) -> None:
+        entries = self._fill()
+        size = os.path.getsize(self.path)
+        last_size = 16 + len("last ✓".encode()) + len("world") + 4
+        for cut in range(1, last_size):
+            with self.subTest(cut=cut):
+                with open(self.path, "r+b") as f:
+                    f.truncate(size - cut)
+                log = BinaryContradictionLog(self.path)
+                self.assertEqual(len(log), 2)
+                self.assertEqual(log.read_all(), entries[:2])
+                self.assertEqual(log.latest(), entries[1])
+        log.append("again", "ok")
+        log.close()
+        reopened = BinaryContradictionLog(self.path)
+        self.assertEqual(
+            [e.prompt for e in reopened.read_all()], ["hello", "", "again"]
+        )
+        self.assertEqual(reopened.latest().reply, "ok")
+
+    def test_records_straddling_read_blocks(self) -> None:
+        class TinyBlocks(BinaryContradictionLog):
+            SCAN_CHUNK = 7
+
+        entries = self._fill()
+        with open(self.path, "r+b") as f:
+            f.truncate(os.path.getsize(self.path) - 3)
+        log = TinyBlocks(self.path)
+        self.assertEqual(len(log), 2)
+        self.assertEqual(log.read_all(), entries[:2])
+        self.assertEqual(log.latest(), entries[1])
+
+    def test_corrupt_trailer_raises(self) -> None:
+        self._fill()
+        with open(self.path, "r+b") as f:
+            f.seek(16 + len("hello") + len("wörld".encode()))
+            f.write(b"\xff\xff\xff\xff")
+        with self.assertRaises(ValueError):
+            BinaryContradictionLog(self.path)
+
+    def test_missing_file(self) -> None:
+        log = BinaryContradictionLog(self.path)
+        self.assertEqual(len(log), 0)
+        self.assertIsNone(log.latest())
+        self.assertEqual(log.read_all(), [])
+
+
+class AsyncContradictionLogTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "log.jsonl")
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    async def test_entries_written_in_order(self) -> None:
+        async with AsyncContradictionLog(self.path) as alog:
+            for i in range(2500):
+                await alog.append("p", str(i))
+            await asyncio.wait_for(alog.drain(), 5)
+            self.assertEqual(len(alog.log), 2500)
+            self.assertEqual(alog.log.latest().reply, "2499")
+        replies = [e.reply for e in ContradictionLog(self.path).read_all()]
+        self.assertEqual(replies, [str(i) for i in range(2500)])
+
+    @needs_fsize_limit
+    async def test_writer_failure_surfaces_and_closes_log(self) -> None:
+        alog = AsyncContradictionLog(self.path)
+        # One entry per batch, so the second one is still queued when the
+        # first batch's flush fails.
+        alog.BATCH_SIZE = 1
+        with _file_size_limit(10):
+            await alog.append("p", "0")
+            await alog.append("p", "1")
+            with self.assertRaises(OSError) as cm:
+                await asyncio.wait_for(alog.drain(), 1)
+            self.assertEqual(cm.exception.errno, errno.EFBIG)
+            self.assertEqual(len(alog.log), 0)
+            self.assertEqual(
+                alog.log.summary(),
+                {"count": 0, "oldest_ts": None, "newest_ts": None},
+            )
+            with self.assertRaises(OSError) as cm:
+                await alog.append("p", "2")
+            self.assertEqual(cm.exception.errno, errno.EFBIG)
+            with self.assertRaises(OSError) as cm:
+                await asyncio.wait_for(alog.aclose(), 1)
+            self.assertEqual(cm.exception.errno, errno.EFBIG)
+        self.assertIsNone(alog.log._fh)
+
+
+if __name__ == "__main__":
+    unittest.main()
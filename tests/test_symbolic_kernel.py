@@ -0,0 +1,286 @@
+import contextlib
+import errno
+import gc
+import json
+import math
+import os
+import random
+import signal
+import statistics
+import tempfile
+import unittest
+
+try:
+    import resource
+except ImportError:  # not on Windows
+    resource = None
+
+import symbolic_kernel as sk
+
+
+def _open_fds() -> int:
+    return len(os.listdir("/proc/self/fd"))
+
+
+@contextlib.contextmanager
+def _file_size_limit(limit: int):
+    """Make writes past `limit` bytes fail with EFBIG, as on a full disk."""
+    soft, hard = resource.getrlimit(resource.RLIMIT_FSIZE)
+    handler = signal.signal(signal.SIGXFSZ, signal.SIG_IGN)
+    resource.setrlimit(resource.RLIMIT_FSIZE, (limit, hard))
+    try:
+        yield
+    finally:
+        resource.setrlimit(resource.RLIMIT_FSIZE, (soft, hard))
+        signal.signal(signal.SIGXFSZ, handler)
+
+
+class MemoryLedgerTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "ledger.jsonl")
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    @unittest.skipUnless(os.path.isdir("/proc/self/fd"), "needs /proc")
+    def test_unclosed_ledgers_release_their_handles(self) -> None:
+        before = _open_fds()
+        for i in range(100):
+            sk.MemoryLedger(self.path).append({"i": i})
+        gc.collect()
+        self.assertLessEqual(_open_fds(), before)
+        with open(self.path, encoding="utf-8") as f:
+            self.assertEqual([json.loads(line)["i"] for line in f], list(range(100)))
+
+    @unittest.skipUnless(
+        resource is not None and hasattr(signal, "SIGXFSZ"), "needs RLIMIT_FSIZE"
+    )
+    def test_failed_close_does_not_break_later_appends(self) -> None:
+        ledger = sk.MemoryLedger(self.path)
+        with _file_size_limit(10):
+            ledger.append({"lost": 1})
+            with self.assertRaises(OSError) as cm:
+                ledger.close()
+        self.assertEqual(cm.exception.errno, errno.EFBIG)
+        self.assertIsNone(ledger._fh)
+        ledger.append({"kept": 2})
+        ledger.close()
+        with open(self.path, encoding="utf-8") as f:
+            self.assertTrue(f.read().endswith('{"kept": 2}\n'))
+
+    def test_fingerprint_chain(self) -> None:
+        with sk.MemoryLedger(self.path) as ledger:
+            h1 = ledger.append({"a": 1})
+            h2 = ledger.append({"b": 2})
+        self.assertNotEqual(h1, h2)
+        self.assertEqual(ledger.fingerprint, h2)
+        self.assertEqual(
+            h1, sk.sha256(("0" * 64 + '{"a": 1}').encode("utf-8")).hexdigest()
+        )
+
+
+def _old_psi_prime(x, x_bar):
+    """Ψ′ as originally written, before the self-mirror fast path."""
+    if x_bar is None:
+        x_bar = -x
+    mag = max(1e-9, abs(x) + abs(x_bar))
+    tension = abs(x - x_bar) / mag
+    compassion = max(0.0, 1.0 - tension)
+    render = (x + x_bar) / 2.0 * (0.5 + 0.5 * compassion)
+    return x_bar, compassion, render, {"tension": tension, "mag": mag}
+
+
+def _old_emotional_gravity(breath, mem_vector):
+    psi_vals = [abs(_old_psi_prime(g, -g)[2]) for g in breath.grad()]
+    mlen = min(len(psi_vals), len(mem_vector))
+    return sum(psi_vals[i] * mem_vector[i] for i in range(mlen))
+
+
+class PsiPrimeParityTest(unittest.TestCase):
+    SPECIAL = (
+        0.0, -0.0, 5e-324, -5e-324, 1e-310, -2.2e-308,
+        1e-9, -1e-9, 5e-10, -5e-10, 2.5e-10, 1.0, -1.0, 1e308, -1e308,
+    )
+
+    def _inputs(self):
+        rng = random.Random(11)
+        for x in self.SPECIAL:
+            yield x, None
+            for y in self.SPECIAL:
+                yield x, y
+        for _ in range(20000):
+            x = rng.choice((
+                rng.uniform(-2, 2),
+                math.ldexp(rng.random(), rng.randint(-1080, 1000)),
+            ))
+            x_bar = rng.choice((None, -x, x, rng.uniform(-2, 2), -x * 1.5))
+            yield rng.choice((x, -x)), x_bar
+
+    def assertSameFloat(self, a, b, msg):
+        # repr tells +0.0 from -0.0, which == does not.
+        self.assertEqual(repr(a), repr(b), msg)
+
+    def test_matches_original_formula_bit_for_bit(self) -> None:
+        for x, x_bar in self._inputs():
+            want_bar, compassion, render, detail = _old_psi_prime(x, x_bar)
+            hc = sk.psi_prime(x, x_bar)
+            msg = (x, x_bar)
+            self.assertSameFloat(hc.x_bar, want_bar, msg)
+            self.assertSameFloat(hc.compassion, compassion, msg)
+            self.assertSameFloat(hc.render, render, msg)
+            self.assertSameFloat(hc.detail["tension"], detail["tension"], msg)
+            self.assertSameFloat(hc.detail["mag"], detail["mag"], msg)
+            self.assertSameFloat(sk._psi_render(x, x_bar), render, msg)
+
+    def test_emotional_gravity_constant_fold(self) -> None:
+        rng = random.Random(5)
+        for n in (0, 1, 2, 10, 100):
+            breath = sk.Breath([rng.uniform(-1e3, 1e3) for _ in range(n)])
+            mem = [rng.uniform(-5, 5) for _ in range(rng.randint(0, n + 2))]
+            got = sk.emotional_gravity(breath, mem)
+            self.assertEqual(got, 0.0)
+            self.assertEqual(got, _old_emotional_gravity(breath, mem))
+
+
+class RealityEmotionTest(unittest.TestCase):
+    def test_constant_emotion_gives_zero_slope(self) -> None:
+        rng = random.Random(1)
+        for e in (-0.9400242545366329, 0.1, 0.0, 1e300):
+            for n in (2, 3, 50, 1000):
+                reality = [rng.random() for _ in range(n)]
+                re = sk.RealityEmotion(reality, [e] * n)
+                self.assertEqual(re.dReality_over_dEmotion(), 0.0, (e, n))
+
+    def test_linear_slope(self) -> None:
+        emotion = [0.1 * i for i in range(20)]
+        reality = [3.0 * x + 1.0 for x in emotion]
+        slope = sk.RealityEmotion(reality, emotion).dReality_over_dEmotion()
+        self.assertAlmostEqual(slope, 3.0)
+
+    def assertCloseToStatistics(self, reality, emotion, max_ulps):
+        want = statistics.covariance(reality, emotion)
+        want /= statistics.variance(emotion)
+        got = sk.RealityEmotion(reality, emotion).dReality_over_dEmotion()
+        self.assertLessEqual(abs(got - want) / math.ulp(want), max_ulps)
+
+    def test_nearly_constant_emotion(self) -> None:
+        rng = random.Random(3)
+        for n in (2, 10, 1000):
+            for bump in (1e-12, -3e-13, 1e-15):
+                emotion = [0.7] * (n - 1) + [0.7 + bump]
+                reality = [rng.random() for _ in range(n)]
+                with self.subTest(n=n, bump=bump):
+                    self.assertCloseToStatistics(reality, emotion, 4)
+
+    def test_matches_statistics_module(self) -> None:
+        rng = random.Random(4)
+        for _ in range(500):
+            n = rng.randint(2, 60)
+            self.assertCloseToStatistics(
+                [rng.uniform(-1, 1) for _ in range(n)],
+                [rng.uniform(-1, 1) for _ in range(n)],
+                4,
+            )
+
+    def test_mismatched_or_short_streams(self) -> None:
+        self.assertEqual(sk.RealityEmotion([1.0], [1.0]).dReality_over_dEmotion(), 0.0)
+        self.assertEqual(
+            sk.RealityEmotion([1.0, 2.0], [1.0]).dReality_over_dEmotion(), 0.0
+        )
+
+
+class KernelContextTest(unittest.TestCase):
+    def test_matches_module_functions(self) -> None:
+        rng = random.Random(7)
+        breath = sk.Breath([rng.uniform(-1, 1) for _ in range(12)])
+        frags = [
+            sk.TruthFragment(
+                str(i),
+                rng.uniform(-2, 2),
+                rng.choice([None, rng.uniform(-2, 2)]),
+                emotion=rng.uniform(-1, 1),
+            )
+            for i in range(30)
+        ]
+        ctx = sk.KernelContext(breath, frags)
+        self.assertEqual(ctx.truthstream(), sk.truthstream(frags, breath))
+        self.assertEqual(ctx.render_break(12), sk.render_break(frags, 12))
+        self.assertEqual(
+            ctx.compassion_state_encrypt("s"),
+            sk.compassion_state_encrypt(frags, breath, "s"),
+        )
+
+    def test_empty_fragments(self) -> None:
+        ctx = sk.KernelContext(sk.Breath([0.5]), [])
+        self.assertEqual(ctx.truthstream(), 0.0)
+        self.assertEqual(ctx.render_break(0), 0.0)
+
+
+class ContinuityTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "continuity.json")
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_history_path_in_missing_directory(self) -> None:
+        hist = os.path.join(self.tmp.name, "h1", "hist.jsonl")
+        c = sk.Continuity(self.path, history_path=hist)
+        fp, prev = c.update_fingerprint("a")
+        self.assertIsNone(prev)
+        self.assertTrue(os.path.exists(hist))
+        reloaded = sk.Continuity(self.path, history_path=hist)
+        self.assertEqual(reloaded.state, c.state)
+        self.assertEqual(reloaded.state["fingerprint"], fp)
+
+    def test_reload_and_unchanged_fingerprint(self) -> None:
+        c = sk.Continuity(self.path)
+        c.update_fingerprint("a")
+        c.update_fingerprint("b")
+        c.update_fingerprint("b")
+        reloaded = sk.Continuity(self.path)
+        self.assertEqual(len(reloaded.state["history"]), 2)
+        self.assertEqual(reloaded.state, c.state)
+        self.assertTrue(reloaded.amnesia_alert())
+
+    def test_torn_history_line_is_skipped_and_cut(self) -> None:
+        c = sk.Continuity(self.path)
+        fp, _ = c.update_fingerprint("a")
+        with open(c.history_path, "ab") as f:
+            f.write(b'{"ts": 1')
+        reloaded = sk.Continuity(self.path)
+        self.assertEqual(reloaded.state, c.state)
+        reloaded.update_fingerprint("b")
+        again = sk.Continuity(self.path)
+        self.assertEqual(again.state, reloaded.state)
+        self.assertEqual([e["prev"] for e in again.state["history"]], [None, fp])
+
+    def test_history_ahead_of_current_file_wins(self) -> None:
+        c = sk.Continuity(self.path)
+        c.update_fingerprint("a")
+        with open(self.path, encoding="utf-8") as f:
+            stale = f.read()
+        fp, _ = c.update_fingerprint("b")
+        # A crash after the history append but before os.replace().
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(stale)
+        reloaded = sk.Continuity(self.path)
+        self.assertEqual(reloaded.state["fingerprint"], fp)
+        self.assertEqual(reloaded.update_fingerprint("b"), (fp, fp))
+        self.assertEqual(len(sk.Continuity(self.path).state["history"]), 2)
+
+    def test_legacy_inline_history_is_migrated(self) -> None:
+        evt = {"ts": 1.0, "prev": None, "new": "f" * 64}
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump({"fingerprint": "f" * 64, "history": [evt]}, f)
+        c = sk.Continuity(self.path)
+        self.assertEqual(c.state, {"fingerprint": "f" * 64, "history": [evt]})
+        self.assertFalse(c.amnesia_alert())
+        c.update_fingerprint("x")
+        self.assertEqual(len(sk.Continuity(self.path).state["history"]), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()